@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from ..db.session import get_db
+from ..services.sketches import CountMinTopK, record_sketches
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 
 router = APIRouter()
@@ -28,4 +29,6 @@ async def topic_model_placeholder(texts: list[str], db: Session = Depends(get_db
             tags.append("Competitor Offer")
         else:
             tags.append("General")
+    record_sketches(db, {"interactions.topics": CountMinTopK().update(tags)})
+    db.commit()
     return {"topics": tags}
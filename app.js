@@ -41,6 +41,15 @@ function renderTable(container, rows, maxRows = 100) {
   }
 }
 
+// Expand a column-oriented payload ({columns, values}) back into row objects
+function columnsToRows(table) {
+  if (!table || !Array.isArray(table.columns)) return table
+  const length = table.values.length ? table.values[0].length : 0
+  return Array.from({ length }, (_, i) =>
+    Object.fromEntries(table.columns.map((c, j) => [c, table.values[j][i]]))
+  )
+}
+
 function showMessage(container, message, type = 'info') {
   const messageEl = document.createElement('div')
   messageEl.className = `message ${type}-message`
@@ -168,8 +177,10 @@ async function exploreCustomerData() {
     Object.entries(filters).forEach(([key, value]) => {
       if (value) params.append(key, value)
     })
+    params.append('format', 'columns')
     
     const data = await getJSON(`${API_BASE}/ingestion/customers/explore?${params}`)
+    data.customers = columnsToRows(data.customers)
     renderTable(container, data.customers || data, 50)
     
     showMessage(container, `Found ${data.customers?.length || data.length} customers`, 'success')
@@ -0,0 +1,84 @@
+from typing import List
+from fastapi import APIRouter, Depends
+from pydantic import BaseModel, Field
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+import numpy as np
+import pandas as pd
+from ..db.session import get_bulk_read_db
+from ..services.lookalike import get_index
+
+router = APIRouter()
+
+
+class LookalikeRequest(BaseModel):
+    seed_ids: List[str]
+    k: int = Field(10, ge=1)  # neighbours per seed
+    limit: int = Field(1000, ge=1)  # size of the merged expansion list
+
+
+class LookalikeIndexRequest(BaseModel):
+    customer_ids: List[str] | None = None  # None refreshes every customer
+    rebuild: bool = False  # refit feature scaling and categories from scratch
+
+
+@router.post("/lookalike")
+def lookalike_customers(req: LookalikeRequest):
+    """Expand a seed list (e.g. recent churners) with their most similar customers"""
+    # Plain def: the matrix work runs in the threadpool instead of blocking the event loop
+    found, neighbour_ids, dists = get_index().search(req.seed_ids, req.k)
+
+    neighbours = {
+        seed: [
+            {"customer_id": cid, "distance": float(dist)}
+            for cid, dist in zip(neighbour_ids[i], dists[i])
+        ]
+        for i, seed in enumerate(found)
+    }
+
+    # Merge: each candidate keeps its closest distance to any seed; seeds themselves are excluded
+    expansion = []
+    if neighbour_ids.size:
+        flat_ids, flat_dists = neighbour_ids.ravel(), dists.ravel()
+        order = np.lexsort((flat_dists, flat_ids.astype(str)))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = flat_ids[order][1:] != flat_ids[order][:-1]
+        best = order[first]
+        best = best[np.argsort(flat_dists[best], kind="stable")]
+        seeds = set(found)
+        for i in best:
+            if flat_ids[i] in seeds:
+                continue
+            expansion.append({"customer_id": flat_ids[i], "distance": float(flat_dists[i])})
+            if len(expansion) >= req.limit:
+                break
+
+    found_set = set(found)
+    return {
+        "seeds_found": len(found),
+        "missing_seeds": [cid for cid in req.seed_ids if cid not in found_set],
+        "neighbours": neighbours,
+        "expansion": expansion,
+    }
+
+
+@router.post("/lookalike/index")
+def refresh_lookalike_index(req: LookalikeIndexRequest, db: Session = Depends(get_bulk_read_db)):
+    """Encode customers_data rows into the lookalike index"""
+    index = get_index()
+    partial = req.customer_ids is not None and not req.rebuild
+    if partial and index.is_empty():
+        # The encoder's scaling and categories must be fitted on the whole base, not a few rows
+        return {"status": "error", "message": "Index is empty; run a full refresh before refreshing selected customers"}
+
+    if partial:
+        query = text("SELECT * FROM customers_data WHERE customer_id = ANY(:ids)")
+        df = pd.read_sql(query, db.connection(), params={"ids": req.customer_ids})
+    else:
+        df = pd.read_sql(text("SELECT * FROM customers_data"), db.connection())
+
+    if req.rebuild:
+        updated = index.build(df)
+    else:
+        updated = index.upsert(df)
+    return {"status": "ok", "updated": updated, "indexed": index.count}
@@ -1,20 +1,37 @@
-from fastapi import APIRouter
+from typing import List
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+import numpy as np
+from ..db.session import get_db, get_read_db
+from ..services.reason_codes import FEATURES
+from ..services.sketches import TDigest, CountMinTopK, load_sketch, load_sketches, record_sketches, population_stability_index
 
 router = APIRouter()
 
+# Conventional PSI bands: < 0.1 stable, 0.1-0.25 moderate shift, > 0.25 significant drift
+PSI_WARN = 0.1
+PSI_ALERT = 0.25
+
 
 @router.get("/metrics")
-async def metrics():
+async def metrics(db: Session = Depends(get_read_db)):
+    # Served from the persisted sketches, so cost does not grow with the customers table
+    reasons = load_sketch(db, "churn.reasons")
+    regions = {name[len("risk.region."):]: d for name, d in load_sketches(db, "risk.region.").items() if d.total}
     return {
         "daily_churn_trend": [
             {"date": "2025-01-01", "avg_risk": 42},
             {"date": "2025-01-02", "avg_risk": 44},
         ],
         "top_reasons": [
+            {"reason": reason, "count": count} for reason, count in reasons.top(5)
+        ] if reasons else [
             {"reason": "Billing Issue", "count": 120},
             {"reason": "Network Problem", "count": 95},
         ],
         "distribution_by_region": [
+            {"region": region, "avg_risk": round(digest.mean(), 2)} for region, digest in sorted(regions.items())
+        ] if regions else [
             {"region": "Delhi", "avg_risk": 48},
             {"region": "Mumbai", "avg_risk": 41},
         ],
@@ -30,3 +47,72 @@ async def alerts(threshold: float = 80, min_value: float = 1000):
             {"customer_id": "CUST0005", "risk": 87, "bill": 1450},
         ],
     }
+
+
+@router.get("/sketches/{name}")
+async def sketch_summary(
+    name: str,
+    q: List[float] = Query([0.05, 0.25, 0.5, 0.75, 0.95], description="Quantiles for numeric sketches"),
+    bins: int = Query(10, description="Histogram bins for numeric sketches"),
+    db: Session = Depends(get_read_db),
+):
+    """Approximate distribution behind a sketch, e.g. churn.risk, churn.reasons or customers.scored"""
+    sketch = load_sketch(db, name)
+    if sketch is None:
+        return {"name": name, "error": "Sketch not found"}
+    if isinstance(sketch, TDigest):
+        if not sketch.total:
+            return {"name": name, "kind": sketch.kind, "count": 0}
+        if sketch.min == sketch.max:
+            # A single distinct value: linspace would give zero-width bins with no mass
+            edges, counts = np.array([sketch.min, sketch.max]), np.array([sketch.total])
+        else:
+            edges = np.linspace(sketch.min, sketch.max, bins + 1)
+            counts = np.diff(sketch.cdf(edges)) * sketch.total
+        return {
+            "name": name,
+            "kind": sketch.kind,
+            "count": int(sketch.total),
+            "min": sketch.min,
+            "max": sketch.max,
+            "mean": sketch.mean(),
+            "quantiles": dict(zip(map(str, q), sketch.quantile(q).tolist())),
+            "histogram": [
+                {"low": float(low), "high": float(high), "count": round(float(count))}
+                for low, high, count in zip(edges[:-1], edges[1:], counts)
+            ],
+        }
+    if isinstance(sketch, CountMinTopK):
+        return {
+            "name": name,
+            "kind": sketch.kind,
+            "total": sketch.total,
+            "top": [{"item": item, "count": count} for item, count in sketch.top()],
+        }
+    return {"name": name, "kind": sketch.kind, "distinct": sketch.count()}
+
+
+@router.get("/drift")
+async def drift(bins: int = 10, db: Session = Depends(get_read_db)):
+    """PSI of the latest scored features against the training reference"""
+    current = load_sketches(db, "features.")
+    reference = load_sketches(db, "reference.features.")
+    results = []
+    for col in FEATURES:
+        cur, ref = current.get(f"features.{col}"), reference.get(f"reference.features.{col}")
+        if cur is None or ref is None or not cur.total or not ref.total:
+            results.append({"feature": col, "psi": None, "status": "no data"})
+            continue
+        psi = population_stability_index(ref, cur, bins)
+        status = "drift" if psi > PSI_ALERT else ("warning" if psi > PSI_WARN else "stable")
+        results.append({"feature": col, "psi": round(psi, 4), "status": status})
+    return {"bins": bins, "features": results}
+
+
+@router.post("/drift/reference")
+async def set_drift_reference(db: Session = Depends(get_db)):
+    """Snapshot the current feature sketches as the reference, e.g. right after training"""
+    current = load_sketches(db, "features.")
+    record_sketches(db, {f"reference.{name}": sketch for name, sketch in current.items()}, replace=True)
+    db.commit()
+    return {"status": "ok", "features": sorted(current)}
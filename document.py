@@ -1,10 +1,15 @@
-from sqlalchemy import Column, Integer, String, Text
+from sqlalchemy import Column, Integer, String, Text, literal_column
 from sqlalchemy.orm import declarative_mixin
 from sqlalchemy.sql import func
 from sqlalchemy import DateTime
 from pgvector.sqlalchemy import Vector
 from ..db.session import Base
 
+# Text search configuration used by lexical queries; it must match the GIN index
+# migration in the README for the planner to pick the index.
+FTS_CONFIG = literal_column("'english'::regconfig")
+EMBEDDING_DIM = 384
+
 
 class Document(Base):
     __tablename__ = "documents"
@@ -14,5 +19,8 @@ class Document(Base):
     source = Column(String(64), nullable=True)  # e.g., email, call_transcript, crm_note
     title = Column(String(255), nullable=True)
     text = Column(Text, nullable=False)
-    embedding = Column(Vector(384), nullable=True)
+    embedding = Column(Vector(EMBEDDING_DIM), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # The full-text GIN index and the halfvec / binary ANN indexes are not declared here:
+    # building them at startup blocks writes on a large table, so they ship as migrations (README)
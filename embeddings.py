@@ -0,0 +1,102 @@
+"""Sentence embedding backends (torch, torch-int8, onnx) over the same weights, with a parity check"""
+
+import argparse
+import time
+from typing import List
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+from ..core.config import settings
+
+BACKENDS = ("torch", "torch-int8", "onnx")
+
+# Lazy global
+_model: SentenceTransformer | None = None
+
+
+def load_model(backend: str) -> SentenceTransformer:
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {BACKENDS}")
+
+    if backend == "onnx":
+        import onnxruntime
+
+        session_options = onnxruntime.SessionOptions()
+        if settings.embedding_threads > 0:
+            session_options.intra_op_num_threads = settings.embedding_threads
+        return SentenceTransformer(
+            settings.embedding_model,
+            backend="onnx",
+            model_kwargs={
+                "file_name": settings.embedding_onnx_file,
+                "provider": "CPUExecutionProvider",
+                "session_options": session_options,
+            },
+        )
+
+    import torch
+
+    if settings.embedding_threads > 0:
+        torch.set_num_threads(settings.embedding_threads)
+    model = SentenceTransformer(settings.embedding_model, device="cpu")
+    if backend == "torch-int8":
+        # Dynamic quantization: int8 weights for the Linear layers, activations quantized on the fly
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+def get_model() -> SentenceTransformer:
+    global _model
+    if _model is None:
+        _model = load_model(settings.embedding_backend)
+    return _model
+
+
+def check_parity(texts: List[str], backend: str | None = None) -> dict:
+    """Compare a backend against the fp32 PyTorch reference on the same texts"""
+    backend = backend or settings.embedding_backend
+    reference = load_model("torch")
+    candidate = reference if backend == "torch" else load_model(backend)
+
+    started = time.perf_counter()
+    expected = reference.encode(texts, normalize_embeddings=True)
+    reference_secs = time.perf_counter() - started
+    started = time.perf_counter()
+    actual = candidate.encode(texts, normalize_embeddings=True)
+    candidate_secs = time.perf_counter() - started
+
+    # Both sides are unit-normalized, so the row-wise dot product is the cosine similarity
+    cosine = np.sum(np.asarray(expected) * np.asarray(actual), axis=1)
+    return {
+        "backend": backend,
+        "texts": len(texts),
+        "min_cosine": float(cosine.min()),
+        "mean_cosine": float(cosine.mean()),
+        "threshold": settings.embedding_parity_threshold,
+        "passed": bool(cosine.min() >= settings.embedding_parity_threshold),
+        "reference_texts_per_sec": len(texts) / reference_secs,
+        "backend_texts_per_sec": len(texts) / candidate_secs,
+    }
+
+
+def main():
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Check an embedding backend against the fp32 reference model")
+    parser.add_argument("--backend", choices=BACKENDS, help="Backend to check (default EMBEDDING_BACKEND)")
+    parser.add_argument("--csv", required=True, help="CSV file with sample texts")
+    parser.add_argument("--column", default="text", help="Text column in the CSV")
+    parser.add_argument("--limit", type=int, default=1000, help="Maximum number of texts to encode")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv, encoding="utf-8-sig", low_memory=False)
+    texts = df[args.column].dropna().astype(str).head(args.limit).tolist()
+    result = check_parity(texts, args.backend)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+    if not result["passed"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
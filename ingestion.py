@@ -1,26 +1,19 @@
-from fastapi import APIRouter, UploadFile, File, Depends, Query
+from fastapi import APIRouter, UploadFile, File, Depends, Query, Request
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from ..db.session import get_db
+from ..db.session import get_db, get_read_db, get_bulk_db, get_bulk_read_db
 import pandas as pd
 from typing import List, Optional
-from sentence_transformers import SentenceTransformer
 from ..models.document import Document
+from ..services.embeddings import get_model
+from ..services.tabular import tabular_response, TabularFormat
+from ..services.sketches import CountMinTopK, HyperLogLog, record_sketches
 
 router = APIRouter()
 
-# Lazy global
-_model: SentenceTransformer | None = None
-
-def get_model() -> SentenceTransformer:
-    global _model
-    if _model is None:
-        _model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-    return _model
-
 
 @router.get("/customers/count")
-async def get_customer_count(db: Session = Depends(get_db)):
+async def get_customer_count(db: Session = Depends(get_read_db)):
     """Get total customer count"""
     try:
         result = db.execute(text("SELECT COUNT(*) FROM customers_data"))
@@ -31,7 +24,7 @@ async def get_customer_count(db: Session = Depends(get_db)):
 
 
 @router.get("/interactions/count")
-async def get_interaction_count(db: Session = Depends(get_db)):
+async def get_interaction_count(db: Session = Depends(get_read_db)):
     """Get total interaction count"""
     try:
         result = db.execute(text("SELECT COUNT(*) FROM interactions_data"))
@@ -43,11 +36,13 @@ async def get_interaction_count(db: Session = Depends(get_db)):
 
 @router.get("/customers/explore")
 async def explore_customers(
+    request: Request,
     gender: Optional[str] = Query(None, description="Filter by gender"),
     contract: Optional[str] = Query(None, description="Filter by contract type"),
     churn: Optional[str] = Query(None, description="Filter by churn status"),
     limit: int = Query(100, description="Maximum number of customers to return"),
-    db: Session = Depends(get_db)
+    format: TabularFormat | None = Query(None, description="rows, or columns / arrow for compact payloads; defaults to the Accept header"),
+    db: Session = Depends(get_read_db)
 ):
     """Explore customers with optional filters"""
     try:
@@ -72,7 +67,7 @@ async def explore_customers(
         result = db.execute(text(query), params)
         customers = [dict(row._mapping) for row in result]
         
-        return {"customers": customers, "total": len(customers)}
+        return tabular_response(request, "customers", customers, format, total=len(customers))
         
     except Exception as e:
         return {"customers": [], "error": str(e)}
@@ -83,7 +78,7 @@ async def export_customers(
     gender: Optional[str] = Query(None, description="Filter by gender"),
     contract: Optional[str] = Query(None, description="Filter by contract type"),
     churn: Optional[str] = Query(None, description="Filter by churn status"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_bulk_read_db)
 ):
     """Export filtered customers to CSV"""
     try:
@@ -129,7 +124,7 @@ async def export_customers(
 
 
 @router.post("/structured/upload")
-async def upload_structured(files: List[UploadFile] = File(...), db: Session = Depends(get_db)):
+async def upload_structured(files: List[UploadFile] = File(...), db: Session = Depends(get_bulk_db)):
     rows = 0
     for f in files:
         df = pd.read_csv(f.file)
@@ -153,7 +148,7 @@ async def normalize_data(db: Session = Depends(get_db)):
 
 
 @router.post("/documents/csv")
-async def ingest_csv(file: UploadFile = File(...), text_column: str = "text", title_column: str | None = None, customer_id_column: str | None = None, source: str | None = None, db: Session = Depends(get_db)):
+async def ingest_csv(file: UploadFile = File(...), text_column: str = "text", title_column: str | None = None, customer_id_column: str | None = None, source: str | None = None, db: Session = Depends(get_bulk_db)):
     df = pd.read_csv(file.file)
     if text_column not in df.columns:
         return {"status": "error", "message": f"Column '{text_column}' not found"}
@@ -175,5 +170,9 @@ async def ingest_csv(file: UploadFile = File(...), text_column: str = "text", ti
         )
         db.add(doc)
         items.append(doc)
+    record_sketches(db, {
+        "documents.source": CountMinTopK().update(doc.source for doc in items),
+        "documents.customers": HyperLogLog().update(doc.customer_id for doc in items),
+    })
     db.commit()
     return {"status": "ok", "inserted": len(items)}
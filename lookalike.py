@@ -0,0 +1,300 @@
+"""Lookalike customer search: kNN over encoded customers_data rows in a memory-mapped index"""
+
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from ..core.config import settings
+
+NUMERIC_FEATURES = ["tenure", "monthly_charges", "total_charges"]
+BOOLEAN_FEATURES = ["senior_citizen", "partner", "dependents", "paperless_billing"]
+CATEGORICAL_FEATURES = [
+    "gender",
+    "phone_service",
+    "multiple_lines",
+    "internet_service",
+    "online_security",
+    "online_backup",
+    "device_protection",
+    "tech_support",
+    "streaming_tv",
+    "streaming_movies",
+    "contract",
+    "payment_method",
+]
+# Seeds x index rows scored per matrix multiply; bounds the distance matrix to ~16 MB
+SEED_BATCH = 1024
+CHUNK_ROWS = 4096
+
+
+class CustomerEncoder:
+    def __init__(self, means: Dict[str, float], stds: Dict[str, float], categories: Dict[str, List[str]]):
+        self.means = means
+        self.stds = stds
+        self.categories = categories
+
+    @property
+    def dim(self) -> int:
+        return len(NUMERIC_FEATURES) + len(BOOLEAN_FEATURES) + sum(len(v) for v in self.categories.values())
+
+    @classmethod
+    def fit(cls, df: pd.DataFrame) -> "CustomerEncoder":
+        means, stds = {}, {}
+        for col in NUMERIC_FEATURES:
+            values = pd.to_numeric(df.get(col), errors="coerce").astype(float)
+            means[col] = float(values.mean()) if values.notna().any() else 0.0
+            std = float(values.std()) if values.notna().sum() > 1 else 0.0
+            stds[col] = std if std > 0 else 1.0
+        categories = {
+            col: sorted(df[col].dropna().astype(str).unique().tolist()) if col in df.columns else []
+            for col in CATEGORICAL_FEATURES
+        }
+        return cls(means, stds, categories)
+
+    def transform(self, df: pd.DataFrame) -> np.ndarray:
+        parts = []
+        for col in NUMERIC_FEATURES:
+            values = pd.to_numeric(df[col], errors="coerce").astype(float) if col in df.columns else pd.Series(np.nan, index=df.index)
+            # Missing values land on the mean, i.e. contribute no distance
+            parts.append(((values.fillna(self.means[col]) - self.means[col]) / self.stds[col]).to_numpy()[:, None])
+        for col in BOOLEAN_FEATURES:
+            values = df[col].fillna(False).astype(bool) if col in df.columns else pd.Series(False, index=df.index)
+            parts.append(values.to_numpy(dtype=float)[:, None])
+        for col, levels in self.categories.items():
+            if not levels:
+                continue
+            codes = pd.Categorical(df[col].astype(str) if col in df.columns else [None] * len(df), categories=levels).codes
+            one_hot = np.zeros((len(df), len(levels)))
+            known = codes >= 0
+            one_hot[np.flatnonzero(known), codes[known]] = 1.0
+            parts.append(one_hot)
+        return np.hstack(parts).astype(np.float32)
+
+    def to_dict(self) -> dict:
+        return {"means": self.means, "stds": self.stds, "categories": self.categories}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CustomerEncoder":
+        return cls(data["means"], data["stds"], data["categories"])
+
+
+class LookalikeIndex:
+    """Exact kNN (Euclidean) over encoded customers backed by a memory-mapped matrix
+
+    Workers coordinate through a file lock and reload the metadata whenever another
+    worker has written it, so every process sees the same ids and rows.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._meta_stat: tuple | None = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self.encoder: CustomerEncoder | None = None
+        self.ids: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self.capacity = 0
+        self.vectors_file: str | None = None
+        self._vectors: np.memmap | None = None
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.path, "meta.json")
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.path, self.vectors_file)
+
+    @property
+    def count(self) -> int:
+        return len(self.ids)
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        # flock serializes writers against readers, across workers and across threads (each call
+        # opens its own descriptor). The mutex guards the in-memory reload: writers hold it
+        # throughout, readers only until the state is current, so searches run in parallel.
+        self._lock.acquire()
+        holds_mutex = True
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            with open(os.path.join(self.path, ".lock"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    self._refresh()
+                    if not exclusive:
+                        self._lock.release()
+                        holds_mutex = False
+                    yield
+                except BaseException:
+                    if holds_mutex:
+                        # In-memory state may be half-updated; reload from disk next time
+                        self._meta_stat = None
+                    raise
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            if holds_mutex:
+                self._lock.release()
+
+    def _refresh(self) -> None:
+        # Pick up writes made by other workers since this process last looked
+        try:
+            st = os.stat(self._meta_path)
+        except FileNotFoundError:
+            self._reset()
+            self._meta_stat = None
+            return
+        stat = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if stat != self._meta_stat:
+            self._load()
+            self._meta_stat = stat
+
+    def _load(self) -> None:
+        with open(self._meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self._reset()
+        self.encoder = CustomerEncoder.from_dict(meta["encoder"])
+        self.ids = meta["ids"]
+        self.positions = {cid: i for i, cid in enumerate(self.ids)}
+        self.vectors_file = meta["vectors_file"]
+        self._open(meta["capacity"])
+
+    def _open(self, capacity: int) -> None:
+        # Grow the backing file before mapping it; existing rows are preserved
+        self._vectors = None
+        size = capacity * self.encoder.dim * 4
+        with open(self._vectors_path, "ab") as f:
+            if size > os.path.getsize(self._vectors_path):
+                f.truncate(size)
+        self.capacity = capacity
+        if capacity:
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.encoder.dim))
+
+    def _save(self) -> None:
+        if self._vectors is not None:
+            self._vectors.flush()
+        meta = {
+            "encoder": self.encoder.to_dict(),
+            "ids": self.ids,
+            "capacity": self.capacity,
+            "vectors_file": self.vectors_file,
+        }
+        tmp_path = self._meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._meta_path)
+        st = os.stat(self._meta_path)
+        self._meta_stat = (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def is_empty(self) -> bool:
+        with self._locked(exclusive=False):
+            return self.encoder is None
+
+    def build(self, customers: pd.DataFrame) -> int:
+        """Refit the encoder and replace the index with ``customers``"""
+        with self._locked(exclusive=True):
+            self._build(customers)
+            return self.count
+
+    def _build(self, customers: pd.DataFrame) -> None:
+        old_file = self.vectors_file
+        self._reset()
+        self.encoder = CustomerEncoder.fit(customers)
+        # A fresh file per build: workers still mapping the old one keep a valid mapping
+        # until they see the new metadata, and the swap itself is the atomic meta.json replace
+        self.vectors_file = f"vectors-{time.time_ns()}.f32"
+        self._open(0)
+        self._upsert(customers)
+        self._save()
+        if old_file and old_file != self.vectors_file:
+            try:
+                os.remove(os.path.join(self.path, old_file))
+            except FileNotFoundError:
+                pass
+
+    def upsert(self, customers: pd.DataFrame) -> int:
+        """Re-encode existing customers in place and append new ones; returns rows written"""
+        with self._locked(exclusive=True):
+            if self.encoder is None:
+                self._build(customers)
+                return self.count
+            written = self._upsert(customers)
+            self._save()
+            return written
+
+    def _upsert(self, customers: pd.DataFrame) -> int:
+        if customers.empty:
+            return 0
+        customers = customers.drop_duplicates("customer_id", keep="last")
+        vectors = self.encoder.transform(customers)
+        ids = customers["customer_id"].astype(str).tolist()
+        new_ids = [cid for cid in ids if cid not in self.positions]
+        if self.count + len(new_ids) > self.capacity:
+            # Double the capacity so repeated small upserts stay amortized O(1)
+            self._open(max(self.count + len(new_ids), 2 * self.capacity, 1024))
+        for cid in new_ids:
+            self.positions[cid] = len(self.ids)
+            self.ids.append(cid)
+        rows = np.fromiter((self.positions[cid] for cid in ids), dtype=np.int64, count=len(ids))
+        self._vectors[rows] = vectors
+        return len(ids)
+
+    def search(self, seed_ids: List[str], k: int) -> tuple[List[str], np.ndarray, np.ndarray]:
+        """Nearest neighbours of every known seed, computed in vectorized batches
+
+        Returns the seeds found, and (seeds x k) arrays of neighbour customer ids and distances.
+        A seed never matches itself.
+        """
+        with self._locked(exclusive=False):
+            found = [cid for cid in dict.fromkeys(seed_ids) if cid in self.positions]
+            k = max(0, min(k, self.count - 1))
+            rows = np.empty((len(found), k), dtype=np.int64)
+            dists = np.empty((len(found), k), dtype=np.float32)
+            if found and k:
+                seed_rows = np.array([self.positions[cid] for cid in found], dtype=np.int64)
+                for start in range(0, len(found), SEED_BATCH):
+                    batch = slice(start, start + SEED_BATCH)
+                    rows[batch], dists[batch] = self._search_batch(seed_rows[batch], k)
+            return found, np.asarray(self.ids, dtype=object)[rows], dists
+
+    def _search_batch(self, seed_rows: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        queries = np.asarray(self._vectors[seed_rows])
+        query_norms = np.einsum("ij,ij->i", queries, queries)[:, None]
+        best_dist = np.full((len(seed_rows), k), np.inf, dtype=np.float32)
+        best_rows = np.full((len(seed_rows), k), -1, dtype=np.int64)
+        for start in range(0, self.count, CHUNK_ROWS):
+            stop = min(start + CHUNK_ROWS, self.count)
+            block = np.asarray(self._vectors[start:stop])
+            # ||q - x||^2 = ||q||^2 - 2 q.x + ||x||^2 for every seed/row pair at once
+            dist = query_norms - 2.0 * (queries @ block.T) + np.einsum("ij,ij->i", block, block)[None, :]
+            in_block = (seed_rows >= start) & (seed_rows < stop)
+            dist[np.flatnonzero(in_block), seed_rows[in_block] - start] = np.inf
+            merged_dist = np.hstack([best_dist, dist])
+            merged_rows = np.hstack([best_rows, np.broadcast_to(np.arange(start, stop), dist.shape)])
+            keep = np.argpartition(merged_dist, k - 1, axis=1)[:, :k]
+            best_dist = np.take_along_axis(merged_dist, keep, axis=1)
+            best_rows = np.take_along_axis(merged_rows, keep, axis=1)
+
+        order = np.argsort(best_dist, axis=1)
+        best_dist = np.sqrt(np.maximum(np.take_along_axis(best_dist, order, axis=1), 0.0))
+        return np.take_along_axis(best_rows, order, axis=1), best_dist
+
+
+# Lazy global
+_index: LookalikeIndex | None = None
+
+
+def get_index() -> LookalikeIndex:
+    global _index
+    if _index is None:
+        _index = LookalikeIndex(settings.lookalike_index_path)
+    return _index
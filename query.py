@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends
+import time
+from typing import List, Literal
+from fastapi import APIRouter, Depends, Query, Request
 from sqlalchemy.orm import Session
-from sqlalchemy import select
-from pgvector.sqlalchemy import cosine_distance
-from ..db.session import get_db
-from ..models.document import Document
+from sqlalchemy import select, func, cast, literal, text, Float
+from pgvector.sqlalchemy import HALFVEC, BIT
+from ..core.config import settings
+from ..db.session import get_read_db
+from ..services.embeddings import get_model
+from ..services.tabular import tabular_response, TabularFormat
+from ..models.document import Document, FTS_CONFIG, EMBEDDING_DIM
 
 router = APIRouter()
 
@@ -34,43 +39,221 @@ async def generate_sql(nl_query: str):
 
 
 @router.post("/execute")
-async def execute_sql(nl_query: str, db: Session = Depends(get_db)):
+async def execute_sql(
+    nl_query: str,
+    request: Request,
+    format: TabularFormat | None = Query(None, description="rows, or columns / arrow for compact payloads; defaults to the Accept header"),
+    db: Session = Depends(get_read_db),
+):
     sql = nl_to_sql_placeholder(nl_query)
     # Placeholder: skip actual execution without ORM mapping here
-    return {"sql": sql, "rows": []}
+    return tabular_response(request, "rows", [], format, sql=sql)
 
 
 # Vector search over documents
-from sentence_transformers import SentenceTransformer
-_model: SentenceTransformer | None = None
+SNIPPET_CHARS = 500
+# Reciprocal rank fusion damping constant; 60 is the value from the original RRF paper
+RRF_K = 60
+Precision = Literal["full", "half", "binary"]
+# Largest hnsw.ef_search pgvector accepts
+HNSW_MAX_EF_SEARCH = 1000
+# ANN index each compact first pass relies on (created by the README migrations)
+COMPACT_INDEXES = {"half": "ix_documents_embedding_half", "binary": "ix_documents_embedding_bit"}
 
-def get_model() -> SentenceTransformer:
-    global _model
-    if _model is None:
-        _model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-    return _model
+
+def _compact_distance(emb: list[float], precision: str):
+    # Expressions must match the compact index migrations in the README to hit the ANN indexes
+    if precision == "half":
+        return cast(Document.embedding, HALFVEC(EMBEDDING_DIM)).op("<=>", return_type=Float)(
+            literal(emb, HALFVEC(EMBEDDING_DIM))
+        )
+    if precision != "binary":
+        raise ValueError(f"Unknown search precision '{precision}'")
+    bits = "".join("1" if x > 0 else "0" for x in emb)
+    return cast(func.binary_quantize(Document.embedding), BIT(EMBEDDING_DIM)).op("<~>", return_type=Float)(
+        literal(bits, BIT(EMBEDDING_DIM))
+    )
+
+
+def _compact_index_bytes(db: Session, precision: str) -> int | None:
+    """On-disk size of the compact index for ``precision``, or None when it is missing or invalid"""
+    # A failed CREATE INDEX CONCURRENTLY leaves an invalid index the planner never uses
+    return db.execute(
+        text(
+            "SELECT pg_relation_size(i.indexrelid) FROM pg_indexes x "
+            "JOIN pg_index i ON i.indexrelid = format('%I.%I', x.schemaname, x.indexname)::regclass "
+            "WHERE x.tablename = :table AND x.indexname = :index AND i.indisvalid"
+        ),
+        {"table": Document.__tablename__, "index": COMPACT_INDEXES[precision]},
+    ).scalar()
+
+
+def _missing_index_message(precision: str) -> str:
+    return f"Index '{COMPACT_INDEXES[precision]}' is missing; create it (see README) before using {precision} precision"
+
+
+def _shortlist_size(limit: int) -> int:
+    return min(max(limit, settings.embedding_rerank_candidates), HNSW_MAX_EF_SEARCH)
+
+
+def _prepare_candidate_search(db: Session, precision: str, limit: int) -> None:
+    # HNSW returns at most ef_search rows, so widen it to cover the re-rank shortlist
+    if precision != "full":
+        db.execute(text(f"SET LOCAL hnsw.ef_search = {_shortlist_size(limit)}"))
+
+
+def _vector_ranking(emb: list[float], limit: int, precision: str = "full"):
+    if precision == "full":
+        source = select(Document.id, Document.embedding).where(Document.embedding.isnot(None)).subquery("candidates")
+    else:
+        # First pass over the compact index, then re-rank the shortlist at full precision
+        source = (
+            select(Document.id, Document.embedding)
+            .where(Document.embedding.isnot(None))
+            .order_by(_compact_distance(emb, precision))
+            .limit(_shortlist_size(limit))
+            .subquery("candidates")
+        )
+    distance = source.c.embedding.cosine_distance(emb)
+    return (
+        select(
+            source.c.id.label("id"),
+            func.row_number().over(order_by=distance).label("rank"),
+            distance.label("distance"),
+        )
+        .order_by(distance)
+        .limit(limit)
+        .cte("vector_ranked")
+    )
+
+
+def _lexical_ranking(q: str, limit: int):
+    tsquery = func.websearch_to_tsquery(FTS_CONFIG, q)
+    rank = func.ts_rank_cd(func.to_tsvector(FTS_CONFIG, Document.text), tsquery)
+    return (
+        select(Document.id.label("id"), func.row_number().over(order_by=rank.desc()).label("rank"))
+        .where(func.to_tsvector(FTS_CONFIG, Document.text).op("@@")(tsquery))
+        .order_by(rank.desc())
+        .limit(limit)
+        .cte("lexical_ranked")
+    )
+
+
+def _hydrate(ranked, score):
+    # Project only what the response needs; the full text and embedding stay in the database
+    return select(
+        Document.id,
+        Document.title,
+        Document.source,
+        Document.customer_id,
+        func.left(Document.text, SNIPPET_CHARS).label("snippet"),
+        (func.length(Document.text) > SNIPPET_CHARS).label("truncated"),
+        score.label("score"),
+    ).join(ranked, ranked.c.id == Document.id)
 
 
 @router.get("/vector-search")
-async def vector_search(q: str, k: int = 5, db: Session = Depends(get_db)):
+async def vector_search(
+    q: str,
+    k: int = 5,
+    mode: Literal["vector", "hybrid"] = Query("vector", description="vector, or hybrid (full-text + vector with reciprocal rank fusion)"),
+    precision: Precision | None = Query(None, description="First-pass precision; defaults to EMBEDDING_SEARCH_PRECISION"),
+    db: Session = Depends(get_read_db),
+):
+    precision = precision or settings.embedding_search_precision
+    # Without its index a compact pass is a sequential scan that casts every row
+    if precision != "full" and _compact_index_bytes(db, precision) is None:
+        return {"status": "error", "message": _missing_index_message(precision)}
     model = get_model()
     emb = model.encode([q], normalize_embeddings=True)[0].tolist()
-    stmt = (
-        select(Document)
-        .order_by(cosine_distance(Document.embedding, emb))
-        .limit(k)
-    )
-    rows = db.execute(stmt).scalars().all()
+    # Each hybrid ranking contributes a few extra candidates so fusion can promote
+    # documents that are mid-ranked in both lists
+    candidates = max(k * 4, 20) if mode == "hybrid" else k
+    _prepare_candidate_search(db, precision, candidates)
+    if mode == "hybrid":
+        vec = _vector_ranking(emb, candidates, precision)
+        lex = _lexical_ranking(q, candidates)
+        fused = (
+            select(
+                func.coalesce(vec.c.id, lex.c.id).label("id"),
+                (
+                    func.coalesce(1.0 / (RRF_K + vec.c.rank), 0.0)
+                    + func.coalesce(1.0 / (RRF_K + lex.c.rank), 0.0)
+                ).label("score"),
+            )
+            .select_from(vec.join(lex, vec.c.id == lex.c.id, full=True))
+            .cte("fused")
+        )
+        stmt = _hydrate(fused, fused.c.score).order_by(fused.c.score.desc()).limit(k)
+    else:
+        ranked = _vector_ranking(emb, k, precision)
+        stmt = _hydrate(ranked, 1 - ranked.c.distance).order_by(ranked.c.rank)
+    rows = db.execute(stmt).all()
     return {
         "query": q,
+        "mode": mode,
+        "precision": precision,
         "results": [
             {
                 "id": r.id,
                 "title": r.title,
                 "source": r.source,
                 "customer_id": r.customer_id,
-                "text": r.text[:500] + ("…" if len(r.text) > 500 else ""),
+                "text": r.snippet + ("…" if r.truncated else ""),
+                "score": float(r.score),
             }
             for r in rows
         ],
     }
+
+
+@router.get("/vector-search/precision-report")
+async def vector_search_precision_report(
+    q: List[str] = Query(..., description="Sample queries; repeat the parameter for several"),
+    k: int = 10,
+    db: Session = Depends(get_read_db),
+):
+    """Recall@k and latency of each first-pass precision against exact full-precision search
+
+    Compact precisions whose index is missing are flagged instead of measured, since a
+    sequential scan would report exact recall at an unrepresentative latency.
+    """
+    model = get_model()
+    embs = [e.tolist() for e in model.encode(q, normalize_embeddings=True)]
+    # The heap keeps the full vectors whatever the precision; compact indexes are extra storage
+    table_bytes = db.execute(text("SELECT pg_table_size(CAST(:table AS regclass))"), {"table": Document.__tablename__}).scalar()
+    exact: list[set] = []
+    report = []
+    for precision in ("full", "half", "binary"):
+        index_bytes = None if precision == "full" else _compact_index_bytes(db, precision)
+        if precision != "full" and index_bytes is None:
+            report.append({
+                "precision": precision,
+                "index": COMPACT_INDEXES[precision],
+                "index_missing": True,
+                "message": _missing_index_message(precision),
+            })
+            continue
+        latencies, recalls = [], []
+        for i, emb in enumerate(embs):
+            _prepare_candidate_search(db, precision, k)
+            ranked = _vector_ranking(emb, k, precision)
+            started = time.perf_counter()
+            ids = set(db.execute(select(ranked.c.id)).scalars().all())
+            latencies.append((time.perf_counter() - started) * 1000)
+            db.rollback()  # end the transaction so SET LOCAL does not leak into the next run
+            if precision == "full":
+                exact.append(ids)
+            recalls.append(len(ids & exact[i]) / len(exact[i]) if exact[i] else 1.0)
+        latencies.sort()
+        report.append({
+            "precision": precision,
+            "index": COMPACT_INDEXES.get(precision),
+            "index_missing": False,
+            "index_bytes": index_bytes,
+            "rerank_candidates": None if precision == "full" else _shortlist_size(k),
+            "recall_at_k": sum(recalls) / len(recalls),
+            "latency_ms_p50": latencies[len(latencies) // 2],
+            "latency_ms_max": latencies[-1],
+        })
+    return {"k": k, "queries": len(q), "table_bytes": table_bytes, "results": report}
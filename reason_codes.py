@@ -0,0 +1,153 @@
+"""Batch churn reason codes from a linear surrogate model over ChurnFeatures (not the churn_risk scorer)"""
+
+import time
+from typing import List
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from .sketches import TDigest, CountMinTopK, HyperLogLog, delete_sketches, record_sketches
+
+FEATURES = [
+    "usage_drop_pct",
+    "billing_issue_count",
+    "negative_sentiment_ratio",
+    "avg_ticket_resolution_days",
+    "monthly_bill",
+]
+REASON_LABELS = {
+    "usage_drop_pct": "Usage Drop",
+    "billing_issue_count": "Billing Issue",
+    "negative_sentiment_ratio": "Negative Sentiment",
+    "avg_ticket_resolution_days": "Slow Ticket Resolution",
+    "monthly_bill": "High Bill",
+}
+# Until enough labelled rows exist, treat every signal as raising risk equally
+DEFAULT_WEIGHTS = np.ones(len(FEATURES))
+MIN_TRAINING_ROWS = 50
+# Contributions below this many log-odds are noise, not a reason
+MIN_CONTRIBUTION = 0.1
+WRITE_BATCH_SIZE = 10000
+
+# Latest feature snapshot per customer, with the current score for the dashboard sketches
+LATEST_FEATURES_SQL = text(
+    f"""
+    SELECT DISTINCT ON (f.customer_id)
+        f.customer_id, {", ".join("f." + col for col in FEATURES)}, f.label_churned, c.region, c.churn_risk
+    FROM churn_features AS f
+    LEFT JOIN customers AS c ON c.customer_id = f.customer_id
+    ORDER BY f.customer_id, f.created_at DESC, f.id DESC
+    """
+)
+
+BULK_UPDATE_SQL = text(
+    """
+    UPDATE customers AS c
+    SET churn_reason = v.reason
+    FROM unnest(CAST(:ids AS text[]), CAST(:reasons AS text[])) AS v(customer_id, reason)
+    WHERE c.customer_id = v.customer_id
+      AND c.churn_reason IS DISTINCT FROM v.reason
+    """
+)
+
+
+class ReasonModel:
+    """Logistic surrogate refitted on each refresh; its reasons can disagree with churn_risk"""
+
+    def __init__(self, means: np.ndarray, stds: np.ndarray, weights: np.ndarray):
+        self.means = means
+        self.stds = stds
+        self.weights = weights
+
+    @staticmethod
+    def _matrix(df: pd.DataFrame) -> np.ndarray:
+        return np.column_stack([
+            pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float) if col in df.columns else np.full(len(df), np.nan)
+            for col in FEATURES
+        ])
+
+    def _standardize(self, X: np.ndarray) -> np.ndarray:
+        # Missing features sit at the mean and therefore contribute nothing
+        return np.nan_to_num((X - self.means) / self.stds, nan=0.0)
+
+    @classmethod
+    def fit(cls, df: pd.DataFrame) -> "ReasonModel":
+        X = cls._matrix(df)
+        with np.errstate(all="ignore"):
+            means = np.nan_to_num(np.nanmean(X, axis=0), nan=0.0) if len(df) else np.zeros(len(FEATURES))
+            stds = np.nan_to_num(np.nanstd(X, axis=0), nan=0.0) if len(df) else np.ones(len(FEATURES))
+        stds[stds == 0] = 1.0
+        model = cls(means, stds, DEFAULT_WEIGHTS.copy())
+
+        labels = pd.to_numeric(df["label_churned"], errors="coerce") if "label_churned" in df.columns else pd.Series(dtype=float)
+        labelled = labels.notna().to_numpy()
+        if labelled.sum() >= MIN_TRAINING_ROWS and labels[labelled].nunique() == 2:
+            clf = LogisticRegression(max_iter=1000)
+            clf.fit(model._standardize(X[labelled]), labels[labelled].astype(int))
+            model.weights = clf.coef_[0]
+        return model
+
+    def contributions(self, df: pd.DataFrame) -> np.ndarray:
+        """(rows x features) log-odds contribution of each feature relative to the average customer"""
+        return self._standardize(self._matrix(df)) * self.weights
+
+    def reason_codes(self, df: pd.DataFrame, top_n: int = 2) -> List[str | None]:
+        """Human-readable top contributors per row
+
+        The labels describe the high side of each feature ("High Bill", "Usage Drop"), so a
+        feature is only reported when its weight and the customer's deviation are both positive.
+        """
+        if top_n < 1:
+            raise ValueError("top_n must be at least 1")
+        z = self._standardize(self._matrix(df))
+        contrib = np.where((self.weights > 0) & (z > 0), z * self.weights, 0.0)
+        top_n = min(top_n, len(FEATURES))
+        order = np.argsort(-contrib, axis=1)[:, :top_n]
+        top = np.take_along_axis(contrib, order, axis=1)
+        labels = np.array([REASON_LABELS[f] for f in FEATURES], dtype=object)[order]
+        labels[top < MIN_CONTRIBUTION] = None
+        return ["; ".join(l for l in row if l) or None for row in labels]
+
+
+def write_reasons(db: Session, customer_ids: List[str], reasons: List[str | None]) -> None:
+    # One UPDATE ... FROM unnest() per batch instead of one statement per customer
+    for start in range(0, len(customer_ids), WRITE_BATCH_SIZE):
+        stop = start + WRITE_BATCH_SIZE
+        db.execute(BULK_UPDATE_SQL, {"ids": customer_ids[start:stop], "reasons": reasons[start:stop]})
+    db.commit()
+
+
+def _scoring_sketches(df: pd.DataFrame, reasons: List[str | None]) -> dict:
+    sketches = {f"features.{col}": TDigest().update(pd.to_numeric(df[col], errors="coerce")) for col in FEATURES}
+    sketches["churn.reasons"] = CountMinTopK().update(pd.Series(reasons, dtype=object).dropna().str.split("; ").explode())
+    sketches["churn.risk"] = TDigest().update(pd.to_numeric(df["churn_risk"], errors="coerce"))
+    sketches["customers.scored"] = HyperLogLog().update(df["customer_id"].astype(str))
+    for region, group in df.dropna(subset=["region"]).groupby("region"):
+        sketches[f"risk.region.{region}"] = TDigest().update(pd.to_numeric(group["churn_risk"], errors="coerce"))
+    return sketches
+
+
+def refresh_churn_reasons(db: Session, top_n: int = 2) -> dict:
+    started = time.perf_counter()
+    df = pd.read_sql(LATEST_FEATURES_SQL, db.connection())
+    loaded = time.perf_counter()
+    model = ReasonModel.fit(df)
+    reasons = model.reason_codes(df, top_n)
+    computed = time.perf_counter()
+    write_reasons(db, df["customer_id"].astype(str).tolist(), reasons)
+    finished = time.perf_counter()
+    # Each refresh covers the whole base, so it replaces rather than adds to the snapshot sketches
+    # Regions with no customers left must disappear from the dashboard too
+    delete_sketches(db, "risk.region.")
+    record_sketches(db, _scoring_sketches(df, reasons), replace=True)
+    db.commit()
+    return {
+        "customers": len(df),
+        "weights": dict(zip(FEATURES, map(float, model.weights))),
+        "load_secs": loaded - started,
+        "compute_secs": computed - loaded,
+        "write_secs": finished - computed,
+        "with_reason": sum(reason is not None for reason in reasons),
+    }
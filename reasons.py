@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from ..db.session import get_bulk_db
+from ..services.reason_codes import refresh_churn_reasons
+
+router = APIRouter()
+
+
+@router.post("/reasons/refresh")
+def refresh_reasons(top_n: int = Query(2, ge=1), db: Session = Depends(get_bulk_db)):
+    """Recompute churn_reason for every customer from a surrogate model over their latest churn features"""
+    result = refresh_churn_reasons(db, top_n)
+    return {"status": "ok", **result}
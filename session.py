@@ -2,8 +2,32 @@ from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, declarative_base
 from ..core.config import settings
 
-engine = create_engine(settings.database_url, pool_pre_ping=True)
+
+def _create_engine(url: str, pool_size: int, max_overflow: int):
+    return create_engine(
+        url,
+        pool_pre_ping=True,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+    )
+
+
+# One pool per workload: interactive vs bulk, primary vs read replica
+engine = _create_engine(settings.database_url, settings.db_pool_size, settings.db_max_overflow)
+bulk_engine = _create_engine(settings.database_url, settings.db_bulk_pool_size, settings.db_bulk_max_overflow)
+if settings.read_database_url == settings.database_url:
+    # No replica configured: share the primary pools rather than opening a second set
+    read_engine, bulk_read_engine = engine, bulk_engine
+else:
+    read_engine = _create_engine(settings.read_database_url, settings.db_pool_size, settings.db_max_overflow)
+    bulk_read_engine = _create_engine(settings.read_database_url, settings.db_bulk_pool_size, settings.db_bulk_max_overflow)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+BulkSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=bulk_engine)
+BulkReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=bulk_read_engine)
 Base = declarative_base()
 
 
@@ -17,15 +41,34 @@ def init_db() -> None:
         # Safe fail: user may not be superuser; skip silently
         pass
     # Import models to register metadata
-    from ..models import customer, interaction, churn, document
+    from ..models import customer, interaction, churn, document, sketch
     Base.metadata.create_all(bind=engine)
 
 
 # Dependency for routes
 
-def get_db():
-    db = SessionLocal()
+def _session_scope(factory):
+    db = factory()
     try:
         yield db
     finally:
         db.close()
+
+
+def get_db():
+    yield from _session_scope(SessionLocal)
+
+
+def get_read_db():
+    """Read-only interactive endpoints; may be served by a replica"""
+    yield from _session_scope(ReadSessionLocal)
+
+
+def get_bulk_db():
+    """Bulk writes such as ingestion jobs"""
+    yield from _session_scope(BulkSessionLocal)
+
+
+def get_bulk_read_db():
+    """Large read-only jobs such as exports; may be served by a replica"""
+    yield from _session_scope(BulkReadSessionLocal)
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, DateTime, JSON
+from sqlalchemy.sql import func
+from ..db.session import Base
+
+
+class Sketch(Base):
+    __tablename__ = "sketches"
+
+    name = Column(String(128), primary_key=True)  # e.g., churn.reasons, features.usage_drop_pct
+    kind = Column(String(32), nullable=False)  # tdigest, topk, hll
+    state = Column(JSON, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
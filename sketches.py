@@ -0,0 +1,273 @@
+"""Mergeable fixed-size sketches (t-digest, count-min top-k, HyperLogLog) persisted in the sketches table"""
+
+import base64
+from typing import Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from ..models.sketch import Sketch
+
+
+def _encode_array(values: np.ndarray) -> str:
+    return base64.b64encode(values.tobytes()).decode("ascii")
+
+
+def _decode_array(data: str, dtype) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype=dtype).copy()
+
+
+def _strings(items: Iterable) -> pd.Series:
+    if not isinstance(items, (pd.Series, np.ndarray, list)):
+        items = list(items)
+    items = pd.Series(items, dtype=object).dropna()
+    # astype(str) is a per-item loop, so skip it when the values already are strings
+    return items if pd.api.types.infer_dtype(items, skipna=True) == "string" else items.astype(str)
+
+
+def _hash64(values: np.ndarray) -> np.ndarray:
+    # pandas' vectorized SipHash with a fixed key: stable across processes, unlike hash(),
+    # so sketches from different workers line up
+    return pd.util.hash_array(np.asarray(values, dtype=object), categorize=False)
+
+
+class TDigest:
+    kind = "tdigest"
+
+    def __init__(self, compression: float = 100, means=None, counts=None, min_value: float = np.inf, max_value: float = -np.inf):
+        self.compression = compression
+        self.means = np.asarray(means if means is not None else [], dtype=float)
+        self.counts = np.asarray(counts if counts is not None else [], dtype=float)
+        self.min = min_value
+        self.max = max_value
+
+    @property
+    def total(self) -> float:
+        return float(self.counts.sum())
+
+    def _compress(self, means: np.ndarray, counts: np.ndarray) -> None:
+        order = np.argsort(means)
+        means, counts = means[order], counts[order]
+        q = (np.cumsum(counts) - counts / 2) / counts.sum()
+        # Arcsine scale function: centroids stay small near the tails and grow towards the median.
+        # Points sharing a k-unit are merged, which bounds the digest to ~compression/2 centroids.
+        k = np.floor(self.compression / (2 * np.pi) * np.arcsin(np.clip(2 * q - 1, -1, 1)))
+        starts = np.r_[0, np.flatnonzero(np.diff(k)) + 1]
+        self.counts = np.add.reduceat(counts, starts)
+        self.means = np.add.reduceat(means * counts, starts) / self.counts
+
+    def update(self, values: Iterable[float]) -> "TDigest":
+        values = np.asarray(values if isinstance(values, (pd.Series, np.ndarray, list)) else list(values), dtype=float)
+        values = values[np.isfinite(values)]
+        if values.size:
+            self.min = min(self.min, float(values.min()))
+            self.max = max(self.max, float(values.max()))
+            self._compress(np.r_[self.means, values], np.r_[self.counts, np.ones(values.size)])
+        return self
+
+    def merge(self, other: "TDigest") -> "TDigest":
+        if other.counts.size:
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self._compress(np.r_[self.means, other.means], np.r_[self.counts, other.counts])
+        return self
+
+    def _curve(self) -> tuple[np.ndarray, np.ndarray]:
+        # Piecewise-linear CDF through the centroid midpoints, pinned to the observed min and max
+        mids = np.cumsum(self.counts) - self.counts / 2
+        return np.r_[0.0, mids, self.total], np.r_[self.min, self.means, self.max]
+
+    def quantile(self, q) -> np.ndarray:
+        if not self.counts.size:
+            return np.full(np.shape(q), np.nan)
+        ranks, values = self._curve()
+        return np.interp(np.asarray(q, dtype=float) * self.total, ranks, values)
+
+    def cdf(self, x) -> np.ndarray:
+        if not self.counts.size:
+            return np.full(np.shape(x), np.nan)
+        ranks, values = self._curve()
+        return np.interp(np.asarray(x, dtype=float), values, ranks) / self.total
+
+    def mean(self) -> float:
+        return float(np.dot(self.means, self.counts) / self.total) if self.counts.size else float("nan")
+
+    def to_dict(self) -> dict:
+        return {
+            "compression": self.compression,
+            "means": self.means.tolist(),
+            "counts": self.counts.tolist(),
+            "min": self.min if np.isfinite(self.min) else None,
+            "max": self.max if np.isfinite(self.max) else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TDigest":
+        return cls(
+            data["compression"],
+            data["means"],
+            data["counts"],
+            data["min"] if data["min"] is not None else np.inf,
+            data["max"] if data["max"] is not None else -np.inf,
+        )
+
+
+class CountMinTopK:
+    kind = "topk"
+
+    def __init__(self, width: int = 2048, depth: int = 4, k: int = 20, table=None, heavy: Dict[str, int] | None = None, total: int = 0):
+        self.width = width
+        self.depth = depth
+        self.k = k
+        self.table = table if table is not None else np.zeros((depth, width), dtype=np.int64)
+        self.heavy = heavy or {}
+        self.total = total
+
+    def _columns(self, hashes: np.ndarray) -> np.ndarray:
+        # Double hashing: row i uses h1 + i * h2, so one 64-bit hash per item covers every row
+        h1 = hashes & np.uint64(0xFFFFFFFF)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        rows = np.arange(self.depth, dtype=np.uint64)[:, None]
+        return ((h1[None, :] + rows * h2[None, :]) % np.uint64(self.width)).astype(np.int64)
+
+    def _estimates(self, items: np.ndarray) -> np.ndarray:
+        columns = self._columns(_hash64(items))
+        return self.table[np.arange(self.depth)[:, None], columns].min(axis=0)
+
+    def estimate(self, item: str) -> int:
+        return int(self._estimates(np.array([item], dtype=object))[0])
+
+    def _trim(self, candidates: np.ndarray) -> None:
+        # Keep 2k candidates so items near the cut-off are not lost between batches
+        candidates = pd.unique(candidates)
+        estimates = self._estimates(candidates)
+        keep = np.argsort(-estimates, kind="stable")[: 2 * self.k]
+        self.heavy = {str(candidates[i]): int(estimates[i]) for i in keep}
+
+    def update(self, items: Iterable[str | None]) -> "CountMinTopK":
+        counts = _strings(items).value_counts()
+        if counts.empty:
+            return self
+        items = counts.index.to_numpy(dtype=object)
+        n = counts.to_numpy(dtype=np.int64)
+        columns = self._columns(_hash64(items))
+        for row in range(self.depth):
+            self.table[row] += np.bincount(columns[row], weights=n, minlength=self.width).astype(np.int64)
+        self.total += int(n.sum())
+        self._trim(np.concatenate([np.array(list(self.heavy), dtype=object), items]))
+        return self
+
+    def merge(self, other: "CountMinTopK") -> "CountMinTopK":
+        self.table += other.table
+        self.total += other.total
+        self._trim(np.array(list(self.heavy) + list(other.heavy), dtype=object))
+        return self
+
+    def top(self, n: int | None = None) -> List[tuple[str, int]]:
+        return list(self.heavy.items())[: n or self.k]
+
+    def to_dict(self) -> dict:
+        return {
+            "width": self.width,
+            "depth": self.depth,
+            "k": self.k,
+            "table": _encode_array(self.table),
+            "heavy": self.heavy,
+            "total": self.total,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CountMinTopK":
+        table = _decode_array(data["table"], np.int64).reshape(data["depth"], data["width"])
+        return cls(data["width"], data["depth"], data["k"], table, data["heavy"], data["total"])
+
+
+class HyperLogLog:
+    kind = "hll"
+
+    def __init__(self, p: int = 12, registers=None):
+        self.p = p
+        self.registers = registers if registers is not None else np.zeros(1 << p, dtype=np.uint8)
+
+    def update(self, items: Iterable[str | None]) -> "HyperLogLog":
+        distinct = pd.unique(_strings(items).to_numpy(dtype=object))
+        if not distinct.size:
+            return self
+        tail_bits = np.uint64(64 - self.p)
+        hashes = _hash64(distinct)
+        index = (hashes >> tail_bits).astype(np.int64)
+        rest = hashes & ((np.uint64(1) << tail_bits) - np.uint64(1))
+        # frexp's exponent is the bit length (exact while rest < 2**53, i.e. p >= 11);
+        # rank = position of the first set bit in the remaining bits, tail_bits + 1 if none
+        _, bit_length = np.frexp(rest.astype(np.float64))
+        rank = (int(tail_bits) - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self) -> int:
+        m = float(self.registers.size)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(float)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction: linear counting is more accurate here
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+    def to_dict(self) -> dict:
+        return {"p": self.p, "registers": _encode_array(self.registers)}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "HyperLogLog":
+        return cls(data["p"], _decode_array(data["registers"], np.uint8))
+
+
+SKETCH_TYPES = {cls.kind: cls for cls in (TDigest, CountMinTopK, HyperLogLog)}
+
+
+def population_stability_index(reference: TDigest, current: TDigest, bins: int = 10) -> float:
+    """PSI over bins cut at the reference deciles (or other quantiles)"""
+    edges = reference.quantile(np.arange(1, bins) / bins)
+    expected = np.diff(np.r_[0.0, reference.cdf(edges), 1.0])
+    actual = np.diff(np.r_[0.0, current.cdf(edges), 1.0])
+    # Floor empty bins so the log term stays finite
+    expected = np.clip(expected, 1e-4, None)
+    actual = np.clip(actual, 1e-4, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def load_sketch(db: Session, name: str):
+    row = db.get(Sketch, name)
+    return SKETCH_TYPES[row.kind].from_dict(row.state) if row else None
+
+
+def load_sketches(db: Session, prefix: str) -> Dict[str, object]:
+    rows = db.execute(select(Sketch).where(Sketch.name.startswith(prefix, autoescape=True))).scalars().all()
+    return {row.name: SKETCH_TYPES[row.kind].from_dict(row.state) for row in rows}
+
+
+def delete_sketches(db: Session, prefix: str) -> None:
+    db.execute(delete(Sketch).where(Sketch.name.startswith(prefix, autoescape=True)))
+
+
+def record_sketches(db: Session, sketches: Dict[str, object], replace: bool = False) -> None:
+    """Merge each sketch into its stored state (or overwrite it when ``replace``); the caller commits"""
+    for name, sketch in sketches.items():
+        inserted = db.execute(
+            insert(Sketch)
+            .values(name=name, kind=sketch.kind, state=sketch.to_dict())
+            .on_conflict_do_nothing(index_elements=[Sketch.name])
+        ).rowcount
+        if inserted:
+            continue
+        row = db.execute(select(Sketch).where(Sketch.name == name).with_for_update()).scalar_one()
+        if not replace and row.kind == sketch.kind:
+            sketch = SKETCH_TYPES[row.kind].from_dict(row.state).merge(sketch)
+        row.kind = sketch.kind
+        row.state = sketch.to_dict()